@@ -1,65 +1,270 @@
 import streamlit as st
 import serial
-import serial.tools.list_ports
-import pandas as pd
-import time
-from threading import Thread, Lock
-import queue
+import gc
+from threading import Event, Thread, RLock
+from collections import deque
 import json
+import logging
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
 from datetime import datetime
+from uuid import uuid4
+from concurrent.futures import wait
+from probes import CALIBRATION_BUTTONS, COMMAND_BYTES, K_TABLE
+from ui_components import ReadingBuffer
+from serial_utils import io_executor, parse_reading, read_response, scan_ports, send_commands, set_low_latency
+
+ACTION_LOG_FILE = "data/calibration_actions.jsonl"
+ACTION_LOG_BACKUPS = 3
+
+@st.cache_resource
+def freeze_startup_objects():
+    """Once per process: park import-time objects so collections only scan what reruns create"""
+    gc.freeze()
+
+freeze_startup_objects()
 
 # Initialize session state variables
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid4().hex
 if 'serial_port' not in st.session_state:
     st.session_state.serial_port = None
 if 'connected' not in st.session_state:
     st.session_state.connected = False
 if 'message_queue' not in st.session_state:
-    st.session_state.message_queue = queue.Queue()
+    st.session_state.message_queue = deque(maxlen=1024)
+if 'reading_history' not in st.session_state:
+    st.session_state.reading_history = ReadingBuffer(size=240)
+if 'history_start' not in st.session_state:
+    st.session_state.history_start = 0  # This session's view of the shared history starts here
 if 'current_reading' not in st.session_state:
     st.session_state.current_reading = "No reading"
 if 'calibration_log' not in st.session_state:
-    st.session_state.calibration_log = []
-
-# Create a lock for thread-safe serial communication
-serial_lock = Lock()
+    st.session_state.calibration_log = deque(maxlen=200)
+if 'log_cursor' not in st.session_state:
+    st.session_state.log_cursor = 0
 
 def get_available_ports():
     """Get list of available serial ports"""
-    return [port.device for port in serial.tools.list_ports.comports()]
+    # No need to enumerate while a port is already open
+    if st.session_state.connected:
+        return (st.session_state.serial_port.port,)
+    # The first scan runs in the background so the initial render is not blocked
+    future = st.session_state.get('port_scan_future')
+    if future is None:
+        future = st.session_state.port_scan_future = io_executor.submit(scan_ports)
+    if not future.done():
+        return ()
+    return tuple(device for device, *_ in future.result())
+
+def rescan_ports():
+    """Drop the cached scan before the click's rerun, which then starts a fresh one"""
+    scan_ports.clear()
+    st.session_state.pop('port_scan_future', None)
 
-def connect_serial(port):
-    """Connect to the selected serial port"""
+@st.cache_resource
+def get_port(device):
+    """Open a serial port once and share the handle across sessions"""
+    serial_port = serial.Serial(
+        port=device,
+        baudrate=9600,
+        timeout=0.01,
+        write_timeout=0.1,
+        parity=serial.PARITY_NONE,
+        stopbits=serial.STOPBITS_ONE,
+        bytesize=serial.EIGHTBITS
+    )
+    # Runs on io_executor, so the hint is kept for finish_connect to show on the script thread
+    serial_port.latency_hint = set_low_latency(serial_port)
+    # Each port gets its own lock so two devices never wait on each other
+    serial_port.lock = RLock()
+    serial_port.readings = deque(maxlen=1024)
+    serial_port.history = ReadingBuffer(size=240)
+    serial_port.sessions = set()  # Sessions connected to this handle; the last one out closes it
+    # Written by the poller thread, rendered by reading_panel on the script thread
+    serial_port.last_error = None
+    return serial_port
+
+def connect_serial(port, session_id):
+    """Connect to the selected serial port (runs on io_executor, errors surface via the future)"""
+    serial_port = get_port(port)
+    with serial_port.lock:
+        if not serial_port.is_open:
+            # Reopen the pooled handle after an earlier disconnect
+            serial_port.open()
+            serial_port.latency_hint = set_low_latency(serial_port)
+        serial_port.sessions.add(session_id)
+    return serial_port
+
+def disconnect_serial(serial_port, session_id):
+    """Leave the pooled port; the last session to leave stops the poller and closes it"""
+    with serial_port.lock:
+        serial_port.sessions.discard(session_id)
+        if serial_port.sessions:
+            return
+        serial_port.stop_polling.set()
+        serial_port.close()
+
+def finish_connect():
+    """Pick up the result of a background connect once it has resolved"""
+    future = st.session_state.get('connect_future')
+    if future is None:
+        return
+    if not future.done():
+        st.info("Connecting...")
+        return
+    del st.session_state.connect_future
     try:
-        serial_port = serial.Serial(
-            port=port,
-            baudrate=9600,
-            timeout=0.1,
-            write_timeout=0.1,
-            parity=serial.PARITY_NONE,
-            stopbits=serial.STOPBITS_ONE,
-            bytesize=serial.EIGHTBITS
-        )
-        return serial_port
+        st.session_state.serial_port = future.result()
     except Exception as e:
         st.error(f"Connection error: {str(e)}")
-        return None
+        return
+    st.session_state.connected = True
+    if st.session_state.serial_port.latency_hint:
+        st.info(st.session_state.serial_port.latency_hint)
+    # Sessions on the same pooled port share its one poller and its readings
+    st.session_state.message_queue = st.session_state.serial_port.readings
+    st.session_state.reading_history = st.session_state.serial_port.history
+    st.session_state.history_start = 0
+    start_poller(st.session_state.serial_port)
+    log_action(f"Connected to {st.session_state.serial_port.port}")
 
 def send_command(command):
-    """Send a command to the serial port"""
+    """Send a command (pre-encoded bytes or raw command text) to the serial port"""
     if st.session_state.serial_port and st.session_state.serial_port.is_open:
         try:
-            with serial_lock:
-                cmd = f"{command}\r"
-                st.session_state.serial_port.write(cmd.encode('ascii'))
+            if isinstance(command, bytes):
+                payload = command
+            else:
+                payload = f"{command}\r".encode('ascii')
+            with st.session_state.serial_port.lock:
+                st.session_state.serial_port.write(payload)
+                response = read_response(st.session_state.serial_port)
+                log_action(f"Sent command: {payload.decode('ascii').strip()}")
+            if response:
+                log_action(f"Response: {', '.join(response)}")
+        except Exception as e:
+            st.error(f"Error sending command: {str(e)}")
+            log_action(f"Error: {str(e)}")
+
+def send_preset(name):
+    """Send one of the pre-encoded COMMAND_BYTES commands"""
+    send_command(COMMAND_BYTES[name])
+
+def send_batch(commands):
+    """Send several commands in one write and log each reply"""
+    if st.session_state.serial_port and st.session_state.serial_port.is_open:
+        try:
+            with st.session_state.serial_port.lock:
+                responses = send_commands(st.session_state.serial_port, commands, timeout=3.0)
+            for command, response in zip(commands, responses):
                 log_action(f"Sent command: {command}")
+                log_action(f"Response: {response}")
         except Exception as e:
             st.error(f"Error sending command: {str(e)}")
             log_action(f"Error: {str(e)}")
 
+def start_poller(ser):
+    """Start the port's reading poller unless one is already running"""
+    with ser.lock:
+        poller = getattr(ser, 'poller', None)
+        if poller is not None and poller.is_alive() and not ser.stop_polling.is_set():
+            return
+        ser.stop_polling = Event()
+        ser.last_error = None
+        ser.poller = Thread(target=poll_readings, args=(ser, ser.stop_polling), daemon=True)
+        ser.poller.start()
+
+def poll_readings(ser, stop):
+    """Keep requesting readings in the background until the port is closed or stop is set"""
+    while ser.is_open and not stop.is_set():
+        try:
+            with ser.lock:
+                if not ser.is_open:
+                    break
+                ser.write(b"R\r")
+                response = read_response(ser)
+        except serial.SerialException as e:
+            ser.last_error = (datetime.now().strftime("%H:%M:%S"), str(e))
+            break
+        if response:
+            ser.readings.append(response[0])
+            value = parse_reading(response[0])
+            if value is not None:  # Status lines such as *OK are not chartable
+                ser.history.append(value)
+        stop.wait(0.002)  # Let queued UI commands take the lock; returns at once on disconnect
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def read_action_history(mtime_ns):
+    """Parse the on-disk action log and its rotated backups, oldest first; keyed on mtime so it is re-read only after new entries"""
+    import pandas as pd
+    paths = [f"{ACTION_LOG_FILE}.{n}" for n in range(ACTION_LOG_BACKUPS, 0, -1)] + [ACTION_LOG_FILE]
+    return pd.concat(
+        [pd.read_json(path, lines=True) for path in paths if Path(path).exists()],
+        ignore_index=True
+    )
+
+@st.cache_resource
+def get_action_logger():
+    """File logger for actions, rotated so the full history stays off the heap"""
+    Path(ACTION_LOG_FILE).parent.mkdir(exist_ok=True)
+    handler = RotatingFileHandler(ACTION_LOG_FILE, maxBytes=1_000_000, backupCount=ACTION_LOG_BACKUPS)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger = logging.getLogger("calibration_actions")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(handler)
+    return logger
+
 def log_action(message):
     """Log actions with timestamp"""
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    st.session_state.calibration_log.append({"timestamp": timestamp, "message": message})
+    entry = {"timestamp": timestamp, "message": message}
+    get_action_logger().info(json.dumps(entry))
+    st.session_state.calibration_log.append(entry)
+    st.session_state.log_cursor += 1
+
+def render_calibration_buttons(probe):
+    """One button per fixed calibration point, side by side"""
+    buttons = CALIBRATION_BUTTONS[probe]
+    for col, (label, command) in zip(st.columns(len(buttons)), buttons):
+        with col:
+            if st.button(label):
+                send_preset(command)
+
+# Only tick while a port is (being) connected; an idle page has nothing new to draw
+@st.fragment(run_every=0.25 if st.session_state.connected or 'connect_future' in st.session_state else None)
+def reading_panel():
+    """Refresh only the current reading box while the rest of the page stays static"""
+    history = st.session_state.reading_history
+    if st.session_state.message_queue and history.index > st.session_state.history_start:
+        st.session_state.current_reading = st.session_state.message_queue[-1]
+    _, values = history.ordered(st.session_state.history_start)
+    delta = f"{values[-1] - values[-2]:+.2f}" if len(values) > 1 else None
+    st.metric("Current Reading", st.session_state.current_reading, delta=delta, label_visibility="collapsed")
+    if len(values) > 1:
+        st.line_chart(values, height=200)
+    serial_port = st.session_state.serial_port
+    if serial_port is not None and serial_port.last_error:
+        when, message = serial_port.last_error
+        st.error(f"Readings stopped at {when}: {message}")
+
+@st.fragment
+def log_panel():
+    """Calibration log table; loading older entries reruns only this section"""
+    if st.button("Load older entries"):
+        try:
+            history = read_action_history(Path(ACTION_LOG_FILE).stat().st_mtime_ns)
+            st.dataframe(history, use_container_width=True)
+        except (FileNotFoundError, ValueError):
+            st.info("No older entries on disk")
+    if st.session_state.calibration_log:
+        # Rebuild the table only when something new has been logged
+        if st.session_state.get('log_df_cursor') != st.session_state.log_cursor:
+            import pandas as pd  # Deferred so first paint does not pay for it before anything is logged
+            st.session_state.log_df = pd.DataFrame(list(st.session_state.calibration_log))
+            st.session_state.log_df_cursor = st.session_state.log_cursor
+        st.dataframe(st.session_state.log_df, use_container_width=True)
 
 def main():
     st.title("Atlas Scientific Probe Calibrator")
@@ -68,22 +273,38 @@ def main():
     with st.sidebar:
         st.header("Connection Settings")
         ports = get_available_ports()
-        selected_port = st.selectbox("Select Serial Port", ports if ports else ["No ports available"])
+        if ports:
+            options = ports
+        elif st.session_state.port_scan_future.done():
+            options = ("No ports available",)
+        else:
+            options = ("Scanning ports...",)
+        selected_port = st.selectbox("Select Serial Port", options)
+        
+        st.button("Rescan ports", on_click=rescan_ports)
         
-        if st.button("Connect" if not st.session_state.connected else "Disconnect"):
+        finish_connect()
+        connecting = 'connect_future' in st.session_state
+        if st.button("Connect" if not st.session_state.connected else "Disconnect", disabled=connecting):
             if not st.session_state.connected:
-                st.session_state.serial_port = connect_serial(selected_port)
-                if st.session_state.serial_port:
-                    st.session_state.connected = True
-                    log_action(f"Connected to {selected_port}")
+                # Opening the port (and any adapter tuning) happens off the script thread
+                st.session_state.connect_future = io_executor.submit(connect_serial, selected_port, st.session_state.session_id)
+                st.rerun()
             else:
                 if st.session_state.serial_port:
-                    st.session_state.serial_port.close()
+                    io_executor.submit(disconnect_serial, st.session_state.serial_port, st.session_state.session_id)
                 st.session_state.serial_port = None
                 st.session_state.connected = False
                 log_action("Disconnected from device")
         
         st.write("Connection Status:", "Connected" if st.session_state.connected else "Disconnected")
+        
+        if st.button("Reset session"):
+            # The readings are shared with other sessions on the port and written by its poller,
+            # so only this session's view moves forward; nothing shared is cleared
+            st.session_state.history_start = st.session_state.reading_history.index
+            st.session_state.calibration_log.clear()
+            st.session_state.current_reading = "No reading"
 
     # Main content area with tabs
     tab1, tab2, tab3, tab4 = st.tabs(["pH Calibration", "EC Calibration", "Temperature", "DO Calibration"])
@@ -91,19 +312,7 @@ def main():
     with tab1:
         st.header("pH Probe Calibration")
         if st.session_state.connected:
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                if st.button("Calibrate pH 7 (Mid)"):
-                    send_command("Cal,mid,7.00")
-            with col2:
-                if st.button("Calibrate pH 4 (Low)"):
-                    send_command("Cal,low,4.00")
-            with col3:
-                if st.button("Calibrate pH 10 (High)"):
-                    send_command("Cal,high,10.00")
-            
-            if st.button("Clear pH Calibration"):
-                send_command("Cal,clear")
+            render_calibration_buttons("pH")
     
     with tab2:
         st.header("EC Probe Calibration")
@@ -111,17 +320,22 @@ def main():
             k_value = st.text_input("K Value", "1.0")
             if st.button("Set K Value"):
                 send_command(f"K,{k_value}")
+            if st.button("Quick setup (clear, set K, dry)"):
+                send_batch(["Cal,clear", f"K,{k_value}", "Cal,dry"])
             
-            col1, col2, col3 = st.columns(3)
+            # Any K can be set; K_TABLE only picks the solution buttons, defaulting to the K 1.0 pair
+            try:
+                points = K_TABLE.get(str(float(k_value)), K_TABLE["1.0"])
+            except ValueError:
+                points = K_TABLE["1.0"]
+            col1, *point_cols = st.columns(3)
             with col1:
                 if st.button("Dry Calibration"):
-                    send_command("Cal,dry")
-            with col2:
-                if st.button("Calibrate 12,880μS"):
-                    send_command("Cal,low")
-            with col3:
-                if st.button("Calibrate 80,000μS"):
-                    send_command("Cal,high")
+                    send_preset("ec_dry")
+            for col, (label, payload) in zip(point_cols, points):
+                with col:
+                    if st.button(label, key=f"ec_{label}"):
+                        send_command(payload)
     
     with tab3:
         st.header("Temperature Calibration")
@@ -133,22 +347,33 @@ def main():
     with tab4:
         st.header("DO Calibration")
         if st.session_state.connected:
-            col1, col2 = st.columns(2)
-            with col1:
-                if st.button("Calibrate to Air"):
-                    send_command("Cal,atm")
-            with col2:
-                if st.button("Calibrate Zero DO"):
-                    send_command("Cal,zero")
+            render_calibration_buttons("DO")
     
     # Display current reading and calibration log
     st.header("Current Reading")
-    st.write(st.session_state.current_reading)
+    reading_panel()
+    if st.session_state.reading_history.index > st.session_state.history_start:
+        st.download_button(
+            "Download readings",
+            data=st.session_state.reading_history.to_csv(st.session_state.history_start),
+            file_name="readings.csv",
+            mime="text/csv"
+        )
     
     st.header("Calibration Log")
-    if st.session_state.calibration_log:
-        log_df = pd.DataFrame(st.session_state.calibration_log)
-        st.dataframe(log_df, use_container_width=True)
+    log_panel()
+    
+    # Refresh once the background port scan or connect has finished
+    pending = [
+        future for future in (
+            st.session_state.get('port_scan_future'),
+            st.session_state.get('connect_future'),
+        )
+        if future is not None and not future.done()
+    ]
+    if pending:
+        wait(pending)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
@@ -1,15 +1,72 @@
 import streamlit as st
 import serial
 import platform
-import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
 from glob import glob
-import sys
+from serial_utils import parse_reading, scan_ports, set_low_latency, wait_until_ready
 
 logging.basicConfig(level=logging.DEBUG)  # Changed to DEBUG for more info
 logger = logging.getLogger(__name__)
 
+@st.cache_data(ttl=3, show_spinner=False)
+def enumerate_ports(system):
+    """Scan for candidate ports once; returns (debug lines, warnings, ports)"""
+    ports = []
+    found = []
+    warnings = []
+    if system == "Windows":
+        # Check both COM ports and USB devices
+        for i in range(1, 21):
+            ports.append(f"COM{i}")
+        
+        # Add additional Windows-specific USB device patterns, from the app-wide cached scan
+        try:
+            for device, description, *_ in scan_ports():
+                if device not in ports:
+                    ports.append(device)
+                    found.append(f"Found port: {device} - {description}")
+        except Exception as e:
+            warnings.append(f"Error scanning Windows ports: {str(e)}")
+            
+    elif system == "Linux":
+        try:
+            # Common Linux port patterns
+            patterns = [
+                "/dev/ttyUSB*",
+                "/dev/ttyACM*",
+                "/dev/ttyS*",
+                "/dev/ttyXRUSB*",
+                "/dev/serial/by-id/*"
+            ]
+            for pattern in patterns:
+                matching_ports = glob(pattern)
+                ports.extend(matching_ports)
+                if matching_ports:
+                    found.append(f"Found ports matching {pattern}: {matching_ports}")
+        except Exception as e:
+            warnings.append(f"Error scanning Linux ports: {str(e)}")
+            
+    elif system == "Darwin":  # macOS
+        try:
+            patterns = [
+                "/dev/tty.usbserial*",
+                "/dev/tty.usbmodem*",
+                "/dev/cu.usbserial*",
+                "/dev/cu.usbmodem*",
+                "/dev/tty.SLAB_USBtoUART*"
+            ]
+            for pattern in patterns:
+                matching_ports = glob(pattern)
+                ports.extend(matching_ports)
+                if matching_ports:
+                    found.append(f"Found ports matching {pattern}: {matching_ports}")
+        except Exception as e:
+            warnings.append(f"Error scanning macOS ports: {str(e)}")
+    
+    # Remove duplicates, keeping discovery order
+    return tuple(found), tuple(warnings), tuple(dict.fromkeys(ports))
+
 class ConnectionHandler:
     def __init__(self):
         self.active_probes = {
@@ -22,119 +79,49 @@ class ConnectionHandler:
     def get_potential_ports(self):
         """Get list of potential ports based on operating system"""
         system = platform.system()
-        st.sidebar.write(f"Detected Operating System: {system}")
+        found, warnings, ports = enumerate_ports(system)
+        for warning in warnings:
+            st.sidebar.warning(warning)
         
-        ports = []
-        if system == "Windows":
-            # Check both COM ports and USB devices
-            for i in range(1, 21):
-                ports.append(f"COM{i}")
-            
-            # Add additional Windows-specific USB device patterns
-            try:
-                from serial.tools import list_ports
-                for port in list_ports.comports():
-                    if port.device not in ports:
-                        ports.append(port.device)
-                        st.sidebar.write(f"Found port: {port.device} - {port.description}")
-            except Exception as e:
-                st.sidebar.warning(f"Error scanning Windows ports: {str(e)}")
-                
-        elif system == "Linux":
-            try:
-                # Common Linux port patterns
-                patterns = [
-                    "/dev/ttyUSB*",
-                    "/dev/ttyACM*",
-                    "/dev/ttyS*",
-                    "/dev/ttyXRUSB*",
-                    "/dev/serial/by-id/*"
-                ]
-                for pattern in patterns:
-                    matching_ports = glob(pattern)
-                    ports.extend(matching_ports)
-                    if matching_ports:
-                        st.sidebar.write(f"Found ports matching {pattern}: {matching_ports}")
-            except Exception as e:
-                st.sidebar.warning(f"Error scanning Linux ports: {str(e)}")
-                
-        elif system == "Darwin":  # macOS
-            try:
-                patterns = [
-                    "/dev/tty.usbserial*",
-                    "/dev/tty.usbmodem*",
-                    "/dev/cu.usbserial*",
-                    "/dev/cu.usbmodem*",
-                    "/dev/tty.SLAB_USBtoUART*"
-                ]
-                for pattern in patterns:
-                    matching_ports = glob(pattern)
-                    ports.extend(matching_ports)
-                    if matching_ports:
-                        st.sidebar.write(f"Found ports matching {pattern}: {matching_ports}")
-            except Exception as e:
-                st.sidebar.warning(f"Error scanning macOS ports: {str(e)}")
-        
-        # Debug output
-        if ports:
-            st.sidebar.write("Available ports:", ports)
-        else:
+        # Debug output, only when asked for so the list is not re-rendered every rerun
+        if st.sidebar.toggle("Show port details", key='debug'):
+            st.sidebar.write(f"Detected Operating System: {system}")
+            for line in found:
+                st.sidebar.write(line)
+            if ports:
+                st.sidebar.write("Available ports:", ports)
+        if not ports:
             st.sidebar.warning("No ports found automatically")
             
-        return list(set(ports))  # Remove duplicates
-
-    def verify_port_exists(self, port):
-        """Verify if a port exists in the system"""
-        try:
-            if platform.system() == "Windows":
-                # For Windows, try to open the port directly
-                try:
-                    ser = serial.Serial(port, 9600, timeout=1)
-                    ser.close()
-                    return True
-                except:
-                    return False
-            else:
-                # For Unix-like systems, check if the device file exists
-                import os
-                return os.path.exists(port)
-        except Exception as e:
-            st.sidebar.error(f"Error verifying port {port}: {str(e)}")
-            return False
+        return list(ports)
 
     def connect_to_port(self, port):
         """Establish connection to selected port with enhanced error handling"""
         try:
-            # First verify port exists
-            if not self.verify_port_exists(port):
-                st.sidebar.error(f"Port {port} does not exist in the system")
-                return None
-
             st.sidebar.info(f"Attempting to connect to {port}...")
             
-            # Try to connect
+            # Open directly; a missing port is reported by the open itself
             ser = serial.Serial(
                 port=port,
                 baudrate=9600,
-                timeout=1,
+                timeout=0.01,  # Short while probing; raised for normal commands below
                 write_timeout=1
             )
-            
-            # Wait for Arduino to reset
-            time.sleep(2)
+            hint = set_low_latency(ser)
+            if hint:
+                st.sidebar.info(hint)
             st.sidebar.info("Port opened, testing communication...")
             
             # Clear any pending data
             ser.reset_input_buffer()
             ser.reset_output_buffer()
             
-            # Test communication
-            ser.write(b"i\r")
-            time.sleep(0.5)
+            # Test communication, waiting out the Arduino reset only if the device does not answer
+            response = wait_until_ready(ser)
             
-            if ser.in_waiting:
-                response = ser.readline().decode().strip()
-                st.sidebar.success(f"Device responded: {response}")
+            if response:
+                ser.timeout = 1
+                st.sidebar.success(f"Device responded: {response[0]}")
                 return ser
             else:
                 ser.close()
@@ -143,7 +130,9 @@ class ConnectionHandler:
                 
         except serial.SerialException as e:
             st.sidebar.error(f"Serial connection error: {str(e)}")
-            if "Permission denied" in str(e):
+            if "No such file" in str(e) or "FileNotFoundError" in str(e):
+                st.sidebar.error(f"Port {port} does not exist in the system")
+            elif "Permission denied" in str(e):
                 st.sidebar.error("Permission denied. On Linux/Mac, try: sudo chmod 666 " + port)
             elif "already in use" in str(e):
                 st.sidebar.error("Port is already in use by another program")
@@ -187,37 +176,6 @@ class ConnectionHandler:
         progress_bar.empty()
         return available_ports
 
-    # ... rest of the ConnectionHandler class methods remain the same ...
-
-    def connect_to_port(self, port):
-        """Establish connection to selected port"""
-        try:
-            ser = serial.Serial(
-                port=port,
-                baudrate=9600,
-                timeout=1,
-                write_timeout=1
-            )
-            
-            # Wait for Arduino to reset
-            time.sleep(2)
-            
-            # Test communication
-            ser.write(b"i\r")
-            time.sleep(0.5)
-            
-            if ser.in_waiting:
-                response = ser.readline().decode().strip()
-                logger.info(f"Connected to {port}: {response}")
-                return ser
-            else:
-                ser.close()
-                return None
-                
-        except Exception as e:
-            logger.error(f"Connection failed: {str(e)}")
-            return None
-
     def send_command(self, ser, command):
         """Send command to device and get response"""
         if not ser or not ser.is_open:
@@ -226,14 +184,10 @@ class ConnectionHandler:
         try:
             ser.reset_input_buffer()
             ser.write(f"{command}\r".encode())
-            time.sleep(0.5)
-            
-            response = []
-            while ser.in_waiting:
-                line = ser.readline().decode().strip()
-                response.append(line)
+            # Returns on the terminator; the port timeout only bounds a silent device
+            response = ser.read_until(b"\r", size=128).decode("ascii", errors="ignore").strip()
                 
-            return response[0] if response else None
+            return response or None
             
         except Exception as e:
             logger.error(f"Command failed: {str(e)}")
@@ -241,13 +195,9 @@ class ConnectionHandler:
 
     def probe_reading(self, ser, probe_type):
         """Get current reading from specified probe"""
-        try:
-            response = self.send_command(ser, "R")
-            if response and response.replace('.','').isdigit():
-                return float(response)
-        except:
-            pass
-        return 0.000
+        response = self.send_command(ser, "R")
+        value = parse_reading(response) if response else None
+        return value if value is not None else 0.000
 
     def calibrate_probe(self, ser, probe_type, point, value):
         """Calibrate specified probe"""
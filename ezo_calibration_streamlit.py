@@ -1,7 +1,9 @@
 
 import streamlit as st
-import serial
-import time
+from threading import Lock
+from uuid import uuid4
+from serial_utils import AsyncSerial, set_low_latency
+from ui_components import ReadingBuffer
 
 # Configuration for serial communication
 SERIAL_PORT = 'COM3'  # Update with your Arduino's serial port
@@ -11,23 +13,22 @@ BAUD_RATE = 9600
 @st.cache_resource
 def get_serial_connection():
     try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
-        time.sleep(2)  # Wait for the connection to stabilize
+        ser = AsyncSerial(SERIAL_PORT, BAUD_RATE)
+        ser.history = ReadingBuffer(size=240)
+        # Sessions with live readings on; the shared poller runs while any remain
+        ser.listeners = set()
+        ser.lock = Lock()
+        hint = set_low_latency(ser.serial)
+        if hint:
+            st.info(hint)
+        ser.wait_until_ready()
         return ser
     except Exception as e:
         st.error(f"Error connecting to Arduino: {e}")
         return None
 
-# Send a command to the Arduino and get a response
-def send_command(ser, command):
-    try:
-        ser.write((command + "\r").encode())  # Send command
-        time.sleep(0.5)  # Allow time for response
-        response = ser.readlines()
-        return [line.decode().strip() for line in response]
-    except Exception as e:
-        st.error(f"Error communicating with Arduino: {e}")
-        return []
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid4().hex
 
 # Streamlit app layout
 st.title("EZO Device Calibration")
@@ -49,7 +50,7 @@ device_type = st.sidebar.selectbox("Choose a sensor type:", [
 # Commands and actions
 if st.sidebar.button("List Devices"):
     st.sidebar.write("Listing available devices...")
-    response = send_command(ser, "!list")
+    response = ser.send_command("!list")
     st.sidebar.write(response)
 
 # Calibration workflow
@@ -59,41 +60,63 @@ if device_type == "pH":
     st.subheader("pH Calibration")
     mid_value = st.number_input("Midpoint (e.g., 7.00)", value=7.00, step=0.01)
     if st.button("Calibrate Midpoint"):
-        response = send_command(ser, f"Cal,mid,{mid_value}")
+        response = ser.send_command(f"Cal,mid,{mid_value}")
         st.write(response)
 elif device_type == "Dissolved Oxygen (DO)":
     st.subheader("Dissolved Oxygen Calibration")
     if st.button("Air Calibration"):
-        response = send_command(ser, "Cal")
+        response = ser.send_command("Cal")
         st.write(response)
 elif device_type == "Electrical Conductivity (EC)":
     st.subheader("Electrical Conductivity Calibration")
     ec_value = st.number_input("Calibration Solution (µS/cm)", value=1413, step=1)
     if st.button("Calibrate EC"):
-        response = send_command(ser, f"Cal,{ec_value}")
+        response = ser.send_command(f"Cal,{ec_value}")
         st.write(response)
 elif device_type == "Temperature (RTD)":
     st.subheader("Temperature Calibration")
     temp_value = st.number_input("Temperature (°C)", value=25.0, step=0.1)
     if st.button("Calibrate Temperature"):
-        response = send_command(ser, f"Cal,{temp_value}")
+        response = ser.send_command(f"Cal,{temp_value}")
         st.write(response)
 elif device_type == "Oxidation-Reduction Potential (ORP)":
     st.subheader("ORP Calibration")
     orp_value = st.number_input("Calibration Solution (mV)", value=475, step=1)
     if st.button("Calibrate ORP"):
-        response = send_command(ser, f"Cal,{orp_value}")
+        response = ser.send_command(f"Cal,{orp_value}")
         st.write(response)
 
 # Temperature compensation
 st.subheader("Temperature Compensation")
 temp_comp = st.number_input("Set Temperature Compensation (°C)", value=25.0, step=0.1)
 if st.button("Set Temperature Compensation"):
-    response = send_command(ser, f"T,{temp_comp}")
+    response = ser.send_command(f"T,{temp_comp}")
     st.write(response)
 
 # Take a reading
 st.subheader("Take a Sensor Reading")
-if st.button("Read Value"):
-    response = send_command(ser, "R")
-    st.write("Sensor Reading:", response)
+live = st.toggle("Live reading")
+with ser.lock:
+    if live:
+        ser.listeners.add(st.session_state.session_id)
+        ser.start_polling(ser.history)
+    else:
+        ser.listeners.discard(st.session_state.session_id)
+        if not ser.listeners:
+            ser.stop_polling()
+
+# Only this block reruns while live readings are on; the rest of the page stays put
+@st.fragment(run_every="1s" if live else None)
+def live_reading():
+    if live:
+        # Snapshot of what the background poller has stored; no serial round trip here
+        _, values = ser.history.ordered()
+        reading = f"{values[-1]:.2f}" if len(values) else "No reading"
+    elif st.button("Read Value"):
+        response = ser.send_command("R")
+        reading = response[0] if response else "No reading"
+    else:
+        return
+    st.metric(label=f"Current {device_type} Reading", value=reading)
+
+live_reading()
@@ -1,12 +1,57 @@
 import streamlit as st
 import serial
-import serial.tools.list_ports
+import io
 import time
-import threading
-from datetime import datetime
-import pandas as pd
-import plotly.graph_objects as go
-from collections import deque
+from styles import minify_css
+from serial_utils import parse_reading, scan_ports, set_low_latency
+
+# Built once at import; reruns only resend the minified string
+EZO_CSS = minify_css("""
+    <style>
+    .reading-card {
+        background-color: white;
+        border-radius: 10px;
+        padding: 20px;
+        margin: 10px 0;
+        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+    }
+    .reading-value {
+        font-size: 36px;
+        font-weight: bold;
+        text-align: center;
+    }
+    .reading-unit {
+        font-size: 16px;
+        color: #666;
+    }
+    .status-indicator {
+        width: 12px;
+        height: 12px;
+        border-radius: 50%;
+        display: inline-block;
+        margin-right: 10px;
+    }
+    .probe-title {
+        font-size: 20px;
+        font-weight: 500;
+        margin-bottom: 10px;
+    }
+    </style>
+""")
+
+# Card markup, filled with str.format per refresh instead of rebuilt as an f-string
+READING_CARD_HTML = minify_css("""
+    <div class="reading-card">
+        <div style="display: flex; align-items: center; margin-bottom: 15px;">
+            <div class="status-indicator" style="background-color: {color};"></div>
+            <div class="probe-title">{name} Reading</div>
+        </div>
+        <div class="reading-value" style="color: {color};">
+            {value:.3f}
+            <span class="reading-unit">{unit}</span>
+        </div>
+    </div>
+""")
 
 class EZOHandler:
     def __init__(self):
@@ -61,12 +106,12 @@ class EZOHandler:
         """List all available COM ports"""
         ports = []
         try:
-            port_list = list(serial.tools.list_ports.comports())
-            for port in port_list:
+            # Cached scan, shared with the other pages, instead of enumerating on every rerun
+            for device, description, hwid, _ in scan_ports():
                 ports.append({
-                    'port': port.device,
-                    'description': port.description,
-                    'hwid': port.hwid
+                    'port': device,
+                    'description': description,
+                    'hwid': hwid
                 })
         except Exception as e:
             st.error(f"Error detecting ports: {str(e)}")
@@ -82,20 +127,21 @@ class EZOHandler:
             ser = serial.Serial(
                 port=port,
                 baudrate=9600,
-                timeout=1,
+                timeout=0.01,  # read1 returns as soon as anything has arrived
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE,
                 bytesize=serial.EIGHTBITS
             )
+            hint = set_low_latency(ser)
+            if hint:
+                st.info(hint)
+            ser.reader = io.BufferedReader(ser, buffer_size=256)
+            ser.pending = bytearray()
             
-            time.sleep(2)  # Wait for connection to stabilize
-            
-            # Test connection
+            # Test connection: one probe, answered as soon as the device is up (same 2.5 s bound as before)
             ser.write(b"i\r")
-            time.sleep(0.5)
-            
-            if ser.in_waiting:
-                response = ser.readline().decode().strip()
+            response = self.read_reply(ser, timeout=2.5)
+            if response:
                 return ser, response
             
             ser.close()
@@ -104,18 +150,35 @@ class EZOHandler:
         except Exception as e:
             return None, str(e)
 
+    def read_line(self, ser, deadline):
+        """Next non-empty line from the port, keeping any bytes past it for the next call"""
+        if not hasattr(ser, 'reader'):
+            # Kept on the port: a discarded BufferedReader would close it when collected
+            ser.reader = io.BufferedReader(ser, buffer_size=256)
+            ser.pending = bytearray()
+        while True:
+            while b"\r" not in ser.pending and time.monotonic() < deadline:
+                ser.pending += ser.reader.read1(128)
+            if b"\r" not in ser.pending:
+                return None
+            line, _, ser.pending = ser.pending.partition(b"\r")
+            line = line.decode(errors="ignore").strip()
+            if line:
+                return line
+
+    def read_reply(self, ser, timeout=1.0):
+        """Return the reply line as soon as it arrives, consuming the *OK/*ER that follows a data line"""
+        deadline = time.monotonic() + timeout
+        line = self.read_line(ser, deadline)
+        if line is not None and line not in ("*OK", "*ER"):
+            self.read_line(ser, deadline)
+        return line
+
     def send_command(self, ser, command):
         """Send command to EZO device and get response"""
         try:
             ser.write(f"{command}\r".encode())
-            time.sleep(0.5)
-            
-            response = []
-            while ser.in_waiting:
-                line = ser.readline().decode().strip()
-                response.append(line)
-            
-            return response[0] if response else None
+            return self.read_reply(ser)
         except Exception as e:
             st.error(f"Command error: {str(e)}")
             return None
@@ -123,12 +186,8 @@ class EZOHandler:
     def get_reading(self, ser):
         """Get current reading from probe"""
         response = self.send_command(ser, "R")
-        try:
-            if response and response.replace('.','').replace('-','').isdigit():
-                return float(response)
-        except:
-            pass
-        return 0.000
+        value = parse_reading(response) if response else None
+        return value if value is not None else 0.000
 
 class EZOUI:
     def __init__(self, handler):
@@ -137,38 +196,7 @@ class EZOUI:
 
     def setup_styles(self):
         """Set up custom CSS styles"""
-        st.markdown("""
-            <style>
-            .reading-card {
-                background-color: white;
-                border-radius: 10px;
-                padding: 20px;
-                margin: 10px 0;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }
-            .reading-value {
-                font-size: 36px;
-                font-weight: bold;
-                text-align: center;
-            }
-            .reading-unit {
-                font-size: 16px;
-                color: #666;
-            }
-            .status-indicator {
-                width: 12px;
-                height: 12px;
-                border-radius: 50%;
-                display: inline-block;
-                margin-right: 10px;
-            }
-            .probe-title {
-                font-size: 20px;
-                font-weight: 500;
-                margin-bottom: 10px;
-            }
-            </style>
-        """, unsafe_allow_html=True)
+        st.markdown(EZO_CSS, unsafe_allow_html=True)
 
     def create_probe_card(self, probe_type, value):
         """Create a card with probe reading and status indicator"""
@@ -189,18 +217,7 @@ class EZOUI:
                 else:
                     color = config['colors']['good']
         
-        html = f"""
-            <div class="reading-card">
-                <div style="display: flex; align-items: center; margin-bottom: 15px;">
-                    <div class="status-indicator" style="background-color: {color};"></div>
-                    <div class="probe-title">{config['name']} Reading</div>
-                </div>
-                <div class="reading-value" style="color: {color};">
-                    {value:.3f}
-                    <span class="reading-unit">{config['unit']}</span>
-                </div>
-            </div>
-        """
+        html = READING_CARD_HTML.format(color=color, name=config['name'], value=value, unit=config['unit'])
         
         st.markdown(html, unsafe_allow_html=True)
 
@@ -212,46 +229,43 @@ class EZOUI:
         current_value = self.handler.get_reading(ser)
         self.create_probe_card(probe_type, current_value)
         
+        def calibrate(command):
+            response = self.handler.send_command(ser, command)
+            st.success(f"Calibration response: {response}")
+        
         if probe_type == "pH":
             col1, col2, col3 = st.columns(3)
             with col1:
                 if st.button("Calibrate pH 7 (Mid)"):
-                    response = self.handler.send_command(ser, "Cal,mid,7")
-                    st.success(f"Calibration response: {response}")
+                    calibrate("Cal,mid,7")
             with col2:
                 if st.button("Calibrate pH 4 (Low)"):
-                    response = self.handler.send_command(ser, "Cal,low,4")
-                    st.success(f"Calibration response: {response}")
+                    calibrate("Cal,low,4")
             with col3:
                 if st.button("Calibrate pH 10 (High)"):
-                    response = self.handler.send_command(ser, "Cal,high,10")
-                    st.success(f"Calibration response: {response}")
+                    calibrate("Cal,high,10")
         
         elif probe_type == "EC":
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("Dry Calibration"):
-                    response = self.handler.send_command(ser, "Cal,dry")
-                    st.success(f"Calibration response: {response}")
+                    calibrate("Cal,dry")
             with col2:
                 value = st.number_input("Solution Value (µS/cm)", 
                                       min_value=0, 
                                       max_value=200000,
                                       value=12880)
                 if st.button("Calibrate"):
-                    response = self.handler.send_command(ser, f"Cal,{value}")
-                    st.success(f"Calibration response: {response}")
+                    calibrate(f"Cal,{value}")
         
         elif probe_type == "DO":
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("Atmospheric Calibration"):
-                    response = self.handler.send_command(ser, "Cal")
-                    st.success(f"Calibration response: {response}")
+                    calibrate("Cal")
             with col2:
                 if st.button("Zero Solution Calibration"):
-                    response = self.handler.send_command(ser, "Cal,0")
-                    st.success(f"Calibration response: {response}")
+                    calibrate("Cal,0")
         
         elif probe_type == "RTD":
             value = st.number_input("Known Temperature (°C)", 
@@ -259,5 +273,4 @@ class EZOUI:
                                   max_value=850.0,
                                   value=25.0)
             if st.button("Calibrate"):
-                response = self.handler.send_command(ser, f"Cal,{value}")
-                st.success(f"Calibration response: {response}")
+                calibrate(f"Cal,{value}")
@@ -1,26 +1,65 @@
 import streamlit as st
 import serial
-import serial.tools.list_ports
-import time
+import re
+from types import MappingProxyType
+from serial_utils import scan_ports, send_command, set_low_latency, wait_until_ready
+
+# Fixed calibration commands, encoded once at import instead of on every click
+COMMAND_BYTES = {name: (payload + "\r").encode("ascii") for name, payload in {
+    "ph_mid": "Cal,mid,7.00",
+    "ph_low": "Cal,low,4.00",
+    "ph_high": "Cal,high,10.00",
+    "ph_clear": "Cal,clear",
+    "ec_dry": "Cal,dry",
+    "do_atm": "Cal,atm",
+    "do_zero": "Cal,zero",
+}.items()}
+
+# EC calibration points for each probe K value, as (button label, encoded command)
+K_TABLE = {
+    "0.1": (("Calibrate 84μS", b"Cal,low,84\r"), ("Calibrate 1,413μS", b"Cal,high,1413\r")),
+    "1.0": (("Calibrate 12,880μS", b"Cal,low,12880\r"), ("Calibrate 80,000μS", b"Cal,high,80000\r")),
+    "10.0": (("Calibrate 12,880μS", b"Cal,low,12880\r"), ("Calibrate 150,000μS", b"Cal,high,150000\r")),
+}
+
+# Fixed-point calibration buttons per tab, as (button label, COMMAND_BYTES key)
+CALIBRATION_BUTTONS = MappingProxyType({
+    "pH": (
+        ("Calibrate pH 7 (Mid)", "ph_mid"),
+        ("Calibrate pH 4 (Low)", "ph_low"),
+        ("Calibrate pH 10 (High)", "ph_high"),
+        ("Clear pH Calibration", "ph_clear"),
+    ),
+    "DO": (
+        ("Calibrate to Air", "do_atm"),
+        ("Calibrate Zero DO", "do_zero"),
+    ),
+})
+
+# pH "Slope,?" reply: acid slope %, base slope %, zero-point offset mV
+_SLOPE_RE = re.compile(r"\??Slope,(-?\d+\.?\d*),(-?\d+\.?\d*),(-?\d+\.?\d*)")
+_SLOPE_VERDICTS = (
+    "Slopes are within 5% of ideal.",
+    "A slope is more than 5% off ideal; recalibrate or replace the probe.",
+)
+
+def interpret_slope_data(slope_data):
+    """Summarise a pH slope reply, or report that it could not be parsed"""
+    match = _SLOPE_RE.match(slope_data)
+    if not match:
+        return f"Error: unexpected slope reply {slope_data!r}"
+    acid, base, offset = map(float, match.groups())
+    verdict = _SLOPE_VERDICTS[abs(acid - 100) > 5 or abs(base - 100) > 5]
+    return f"Acid {acid}%, base {base}%, zero offset {offset} mV. {verdict}"
 
 # Helper function to get serial ports
 def list_serial_ports():
-    ports = serial.tools.list_ports.comports()
-    return [port.device for port in ports]
-
-# Function to send commands to Arduino
-def send_command(ser, command):
-    try:
-        ser.write((command + "\r").encode())
-        time.sleep(0.5)
-        response = ser.readlines()
-        return [line.decode().strip() for line in response]
-    except Exception as e:
-        st.error(f"Error communicating with device: {e}")
-        return []
-
-# Port Testing Setup
+    return [device for device, *_ in scan_ports()]
+
+# Port Testing Setup (stays outside the fragments, which cannot write to the sidebar)
 def setup_port_testing(key_prefix=""):
+    if st.sidebar.button("Rescan ports", key=f"{key_prefix}_rescan_ports_button"):
+        scan_ports.clear()
     ports = list_serial_ports()
     selected_port = st.sidebar.selectbox(
         "Select Port", ports, key=f"{key_prefix}_port_selectbox"
@@ -28,9 +67,14 @@ def setup_port_testing(key_prefix=""):
 
     if st.sidebar.button("Test Port Connection", key=f"{key_prefix}_test_port_button"):
         try:
-            ser = serial.Serial(selected_port, 9600, timeout=1)
-            time.sleep(2)  # Allow connection to stabilize
-            st.sidebar.success("Connected successfully!")
+            ser = serial.Serial(selected_port, 9600, timeout=0.01, dsrdtr=False, rtscts=False)
+            hint = set_low_latency(ser)
+            if hint:
+                st.sidebar.info(hint)
+            if wait_until_ready(ser):
+                st.sidebar.success("Connected successfully!")
+            else:
+                st.sidebar.warning("Port opened, but the device did not answer")
             return ser
         except Exception as e:
             st.sidebar.error(f"Connection failed: {e}")
@@ -39,32 +83,46 @@ def setup_port_testing(key_prefix=""):
 # pH Calibration
 def pH_calibration(key_prefix=""):
     ser = setup_port_testing(key_prefix=key_prefix)
+    _pH_calibration_panel(ser, key_prefix)
 
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        mid_value = st.number_input("Mid Calibration (pH 7.00)", value=7.00, step=0.01, key=f"{key_prefix}_mid_value_input")
-    with col2:
-        low_value = st.number_input("Low Calibration (pH 4.00)", value=4.00, step=0.01, key=f"{key_prefix}_low_value_input")
-    with col3:
-        high_value = st.number_input("High Calibration (pH 10.00)", value=10.00, step=0.01, key=f"{key_prefix}_high_value_input")
-
-    col1, col2, col3, col4 = st.columns(4)
-    if col1.button("Calibrate Mid (pH 7)", key=f"{key_prefix}_calibrate_mid_button"):
+@st.fragment
+def _pH_calibration_panel(ser, key_prefix):
+    # Inside a form, editing the set points does not rerun anything until a step is submitted
+    with st.form(f"{key_prefix}_ph_calibration_form", border=False):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            mid_value = st.number_input("Mid Calibration (pH 7.00)", value=7.00, step=0.01, key=f"{key_prefix}_mid_value_input")
+        with col2:
+            low_value = st.number_input("Low Calibration (pH 4.00)", value=4.00, step=0.01, key=f"{key_prefix}_low_value_input")
+        with col3:
+            high_value = st.number_input("High Calibration (pH 10.00)", value=10.00, step=0.01, key=f"{key_prefix}_high_value_input")
+
+        col1, col2, col3, col4 = st.columns(4)
+        calibrate_mid = col1.form_submit_button("Calibrate Mid (pH 7)")
+        calibrate_low = col2.form_submit_button("Calibrate Low (pH 4)")
+        calibrate_high = col3.form_submit_button("Calibrate High (pH 10)")
+        get_slope = col4.form_submit_button("Get Slope")
+
+    if calibrate_mid:
         response = send_command(ser, f"Cal,mid,{mid_value}")
         st.success("Response: " + str(response))
-    if col2.button("Calibrate Low (pH 4)", key=f"{key_prefix}_calibrate_low_button"):
+    if calibrate_low:
         response = send_command(ser, f"Cal,low,{low_value}")
         st.success("Response: " + str(response))
-    if col3.button("Calibrate High (pH 10)", key=f"{key_prefix}_calibrate_high_button"):
+    if calibrate_high:
         response = send_command(ser, f"Cal,high,{high_value}")
         st.success("Response: " + str(response))
-    if col4.button("Get Slope", key=f"{key_prefix}_get_slope_button"):
+    if get_slope:
         slope_response = send_command(ser, "Slope,?")
-        st.info("Slope Values: " + str(slope_response))
+        st.info(interpret_slope_data(slope_response[0] if slope_response else ""))
 
 # EC Calibration
 def EC_calibration(key_prefix=""):
     ser = setup_port_testing(key_prefix=key_prefix)
+    _EC_calibration_panel(ser, key_prefix)
+
+@st.fragment
+def _EC_calibration_panel(ser, key_prefix):
     col1, col2 = st.columns(2)
     with col1:
         ec_value = st.number_input("Calibration Solution (µS/cm)", value=1413, step=1, key=f"{key_prefix}_ec_value_input")
@@ -75,6 +133,10 @@ def EC_calibration(key_prefix=""):
 # DO Calibration
 def DO_calibration(key_prefix=""):
     ser = setup_port_testing(key_prefix=key_prefix)
+    _DO_calibration_panel(ser, key_prefix)
+
+@st.fragment
+def _DO_calibration_panel(ser, key_prefix):
     if st.button("Air Calibration", key=f"{key_prefix}_calibrate_do_button"):
         response = send_command(ser, "Cal")
         st.success("Response: " + str(response))
@@ -82,6 +144,10 @@ def DO_calibration(key_prefix=""):
 # Temperature Calibration
 def temperature_calibration(key_prefix=""):
     ser = setup_port_testing(key_prefix=key_prefix)
+    _temperature_calibration_panel(ser, key_prefix)
+
+@st.fragment
+def _temperature_calibration_panel(ser, key_prefix):
     col1, col2 = st.columns(2)
     with col1:
         temp_value = st.number_input("Calibration Temperature (°C)", value=25.0, step=0.1, key=f"{key_prefix}_temp_value_input")
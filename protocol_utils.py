@@ -1,6 +1,5 @@
-import serial
-import time
 import streamlit as st
+from serial_utils import read_burst, read_response
 
 class ProtocolManager:
     def __init__(self, serial_conn=None):
@@ -26,9 +25,8 @@ class ProtocolManager:
             return None
             
         try:
-            # Select device
+            # Select device; send_command has already waited for its reply
             self.send_command(str(device_address))
-            time.sleep(0.3)
             
             # Query protocol
             response = self.send_command("Protocol,?")
@@ -115,13 +113,10 @@ class ProtocolManager:
             # Add carriage return to command
             command = f"{command}\r"
             self.serial_conn.write(command.encode())
-            time.sleep(0.3)  # Wait for processing
             
-            # Read response
-            if self.serial_conn.in_waiting:
-                response = self.serial_conn.readline().decode().strip()
-                return response
-            return None
+            # Read response; stops on the *OK/*ER so it is not read as the next command's reply
+            response = read_response(self.serial_conn)
+            return response[0] if response else None
         except Exception as e:
             st.error(f"Command error: {str(e)}")
             return None
@@ -131,10 +126,9 @@ class ProtocolManager:
         try:
             # Send scan command
             self.send_command("!scan")
-            time.sleep(0.3)
             
-            # Read response
-            response = self.serial_conn.read(self.serial_conn.in_waiting).decode()
+            # Read the rest of the scan listing as it arrives
+            response = read_burst(self.serial_conn)
             
             # Check if address appears in response
             return str(address) in response
@@ -155,15 +149,14 @@ class ProtocolManager:
         try:
             # Send scan command
             self.send_command("!scan")
-            time.sleep(0.3)
             
-            # Read response
-            response = self.serial_conn.read(self.serial_conn.in_waiting).decode()
+            # Read the rest of the scan listing as it arrives
+            response = read_burst(self.serial_conn)
             
             # Parse response for addresses
             for line in response.split('\n'):
                 if ':' in line:
-                    addr = int(line.split(':')[0].strip())
+                    addr = int(line.partition(':')[0])
                     used_addresses.append(addr)
                     
             # Return list of unused addresses
@@ -0,0 +1,276 @@
+import serial
+import serial.tools.list_ports
+import serial_asyncio
+import streamlit as st
+import asyncio
+import os
+import selectors
+import re
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# Shared worker for slow serial calls so they stay off the script thread
+io_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="serial-io")
+
+@st.cache_data(ttl=10.0, show_spinner=False)
+def scan_ports():
+    """Enumerate serial ports as (device, description, hwid, vid) tuples; the rescan buttons clear this"""
+    return tuple(
+        (port.device, port.description, port.hwid, port.vid)
+        for port in serial.tools.list_ports.comports()
+    )
+
+# An EZO reading starts with its number; status lines (*OK, ?I,...) do not
+_READING_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+def parse_reading(line):
+    """Leading number of a reply line as a float, or None for status lines"""
+    match = _READING_RE.match(line)
+    return float(match.group()) if match else None
+
+# EZO status lines; after a data line they only acknowledge it, on their own they are the reply
+_STATUS_LINES = ("*OK", "*ER")
+
+def read_response(ser, timeout=1.0):
+    """Read one reply, including the *OK/*ER after a data line; expects a short (~10 ms) port timeout"""
+    lines = []
+    buf = bytearray()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        # Blocks in select() for at most the port timeout and wakes on the terminator
+        buf += ser.read_until(b"\r", size=64)
+        if not buf.endswith(b"\r"):
+            continue
+        line = buf.decode(errors="ignore").strip()
+        buf.clear()
+        if not line:
+            continue
+        lines.append(line)
+        # Stop on the status line so it is not left behind as the next command's reply
+        if line in _STATUS_LINES:
+            break
+    return lines
+
+def read_burst(ser, timeout=1.0, quiet=0.05):
+    """Read a multi-line reply: block in select() for the first byte, stop once the port goes quiet"""
+    buf = bytearray()
+    if os.name != "posix":
+        # No selectable handle for COM ports: poll in_waiting with the same first-byte and quiet bounds
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if ser.in_waiting:
+                buf += ser.read(ser.in_waiting)
+                deadline = time.monotonic() + quiet
+            time.sleep(0.005)
+        return buf.decode(errors="ignore")
+    with selectors.DefaultSelector() as selector:
+        selector.register(ser.fileno(), selectors.EVENT_READ)
+        wait = timeout
+        while selector.select(wait):
+            buf += ser.read(ser.in_waiting or 1)
+            wait = quiet
+    return buf.decode(errors="ignore")
+
+def send_command(ser, command):
+    """Send a command to the device and return its reply lines"""
+    try:
+        ser.write((command + "\r").encode())
+        return read_response(ser)
+    except Exception as e:
+        st.error(f"Error communicating with device: {e}")
+        return []
+
+def send_commands(ser, commands, timeout=2.0):
+    """Pipeline several commands in one write and collect one reply (or None) per command"""
+    ser.write(("\r".join(commands) + "\r").encode())
+    responses = []
+    acknowledged = True  # No data line is waiting for its status line
+    buf = bytearray()
+    deadline = time.monotonic() + timeout
+    # Keep reading until the last data reply has its status line too, so no *OK is left behind
+    while (len(responses) < len(commands) or not acknowledged) and time.monotonic() < deadline:
+        # One line at a time, so replies beyond this batch stay in the port's buffer
+        buf += ser.read_until(b"\r", size=64)
+        if not buf.endswith(b"\r"):
+            continue
+        line = buf.decode(errors="ignore").strip()
+        buf.clear()
+        if not line:
+            continue
+        if line in _STATUS_LINES and not acknowledged:
+            acknowledged = True
+            continue
+        if len(responses) == len(commands):
+            break  # Last reply came without a status line
+        responses.append(line)
+        acknowledged = line in _STATUS_LINES
+    return responses + [None] * (len(commands) - len(responses))
+
+def wait_until_ready(ser, timeout=1.0):
+    """Skip the Arduino auto-reset delay when the device already answers; returns the reply lines"""
+    # EZO needs ~300 ms for "i"; read_response returns as soon as the reply arrives anyway
+    ser.write(b"i\r")
+    reply = read_response(ser, timeout)
+    if reply:
+        return reply
+    time.sleep(1.5)  # Board is probably resetting after the port was opened
+    ser.reset_input_buffer()  # A late answer to the first probe must not become the next command's reply
+    ser.write(b"i\r")
+    return read_response(ser, timeout)
+
+def set_low_latency(ser):
+    """Lower the USB-serial latency timer; returns a setup hint instead of calling st (may run off the script thread)"""
+    if not sys.platform.startswith("linux"):
+        return None
+    hint = None
+    device = os.path.basename(os.path.realpath(ser.port))
+    try:
+        with open(f"/sys/bus/usb-serial/devices/{device}/latency_timer", "w") as f:
+            f.write("1")
+    except FileNotFoundError:
+        pass  # Not an FTDI-style usb-serial adapter (e.g. ttyACM)
+    except PermissionError:
+        hint = f"For faster replies, run: setserial {ser.port} low_latency"
+    try:
+        # TIOCGSERIAL/TIOCSSERIAL with ASYNC_LOW_LATENCY
+        ser.set_low_latency_mode(True)
+    except (ValueError, NotImplementedError):
+        pass
+    return hint
+
+@st.cache_resource
+def get_io_loop():
+    """Start the background event loop that owns the async serial connections"""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="serial-loop", daemon=True).start()
+    return loop
+
+class EZOProtocol(asyncio.Protocol):
+    """Buffers incoming bytes and resolves the pending reply on each carriage return"""
+
+    def __init__(self):
+        self.transport = None
+        self.buffer = bytearray()
+        self.response_future = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.buffer += data
+        while b"\r" in self.buffer:
+            line, _, rest = self.buffer.partition(b"\r")
+            self.buffer = bytearray(rest)
+            # Lines nobody is waiting for (late replies after a timeout) are dropped
+            if self.response_future is not None and not self.response_future.done():
+                self.response_future.set_result(line.decode(errors="ignore").strip())
+
+    def connection_lost(self, exc):
+        if self.response_future is not None and not self.response_future.done():
+            self.response_future.set_exception(exc or serial.SerialException("Port closed"))
+
+class AsyncSerial:
+    """Serial connection driven by pyserial-asyncio on the shared background loop"""
+
+    def __init__(self, port, baudrate=9600):
+        self.loop = get_io_loop()
+        self.transport, self.protocol = asyncio.run_coroutine_threadsafe(
+            serial_asyncio.create_serial_connection(
+                self.loop, EZOProtocol, port, baudrate=baudrate, dsrdtr=False, rtscts=False
+            ),
+            self.loop
+        ).result(timeout=5)
+        self.serial = self.transport.serial
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.run_coroutine_threadsafe(self._worker(), self.loop)
+        self.poller = None
+
+    async def _worker(self):
+        """Sole owner of the port: runs queued commands one at a time, in order"""
+        while True:
+            command, future = await self.queue.get()
+            if future.done():
+                continue  # Caller timed out while the command was queued
+            reply = self.loop.create_future()
+            self.protocol.buffer.clear()
+            self.protocol.response_future = reply
+            try:
+                self.transport.write((command + "\r").encode())
+            except Exception as e:
+                # Fail this command only; the worker must keep serving the queue
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            await asyncio.wait((reply, future), return_when=asyncio.FIRST_COMPLETED)
+            if not reply.done():
+                # Let the abandoned reply arrive so it is not taken as the next command's answer
+                await asyncio.wait((reply,), timeout=1.0)
+            elif not future.done():
+                if reply.exception() is not None:
+                    future.set_exception(reply.exception())
+                else:
+                    future.set_result(reply.result())
+
+    async def send(self, command):
+        """Queue a command and await its carriage-return terminated reply"""
+        future = self.loop.create_future()
+        await self.queue.put((command, future))
+        return [await future]
+
+    async def _poll(self, history, interval, timeout):
+        """Producer side: the only writer to history, so readers never need a lock"""
+        deadline = self.loop.time()
+        while True:
+            try:
+                # Bounded so a dropped reply frees the worker instead of wedging it
+                (line,) = await asyncio.wait_for(self.send("R"), timeout)
+            except (asyncio.TimeoutError, serial.SerialException, OSError):
+                line = ""  # Skip this sample; the next tick tries again
+            value = parse_reading(line)
+            if value is not None:
+                history.append(value)
+            # Fixed grid on the loop's monotonic clock; a slow reply skips ahead instead of bursting
+            deadline = max(deadline + interval, self.loop.time())
+            await asyncio.sleep(deadline - self.loop.time())
+
+    def start_polling(self, history, interval=0.1, timeout=1.0):
+        """Keep requesting readings on the background loop, appending numbers to history"""
+        if self.poller is None or self.poller.done():
+            self.poller = asyncio.run_coroutine_threadsafe(self._poll(history, interval, timeout), self.loop)
+
+    def stop_polling(self):
+        if self.poller is not None:
+            self.poller.cancel()
+
+    def request(self, command, timeout=1.0):
+        """Blocking round trip from the script thread, bounded by timeout"""
+        future = asyncio.run_coroutine_threadsafe(self.send(command), self.loop)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise
+
+    def send_command(self, command, timeout=1.0):
+        """Like request, but reports failures in the UI and returns no lines"""
+        try:
+            return self.request(command, timeout)
+        except FutureTimeout:
+            st.warning(f"No reply to {command} within {timeout}s")
+            return []
+        except Exception as e:
+            st.error(f"Error communicating with device: {e}")
+            return []
+
+    def wait_until_ready(self, timeout=1.0):
+        """Skip the Arduino auto-reset delay when the device already answers"""
+        for delay in (0, 1.5):
+            time.sleep(delay)
+            try:
+                self.request("i", timeout)
+                return True
+            except FutureTimeout:
+                pass
+        return False
@@ -1,10 +1,12 @@
-import serial
-import serial.tools.list_ports
 import time
 import streamlit as st
 from pathlib import Path
 import yaml
 from protocol_utils import ProtocolManager
+import serial_utils
+
+# USB vendor IDs of Arduino boards and of the USB-serial chips used on clones (FTDI, CH340, CP210x)
+ARDUINO_VIDS = frozenset({0x2341, 0x2A03, 0x1A86, 0x0403, 0x10C4})
 
 class WhiteboxSetup:
     def __init__(self, serial_conn=None):
@@ -27,12 +29,10 @@ class WhiteboxSetup:
 
     def detect_arduino(self):
         """Automatically detect Arduino with Whitebox T1"""
-        ports = list(serial.tools.list_ports.comports())
-        arduino_ports = [
-            p.device for p in ports
-            if 'Arduino' in p.description or 'USB Serial' in p.description
+        return [
+            device for device, _, _, vid in serial_utils.scan_ports()
+            if vid in ARDUINO_VIDS
         ]
-        return arduino_ports
 
     def initialize_device(self, device):
         """Initialize and verify device setup"""
@@ -70,17 +70,11 @@ class WhiteboxSetup:
         self.send_command(str(address))
         status = {}
         
-        # Check calibration
-        response = self.send_command("Cal,?")
-        status['calibration'] = response if response else "Unknown"
-        
-        # Check temperature compensation
-        response = self.send_command("T,?")
-        status['temperature'] = response if response else "25.0"
-        
-        # Check slope
-        response = self.send_command("Slope,?")
-        status['slope'] = response if response else "Unknown"
+        # Check calibration, temperature compensation and slope in one round trip
+        calibration, temperature, slope = self.send_commands(["Cal,?", "T,?", "Slope,?"])
+        status['calibration'] = calibration if calibration else "Unknown"
+        status['temperature'] = temperature if temperature else "25.0"
+        status['slope'] = slope if slope else "Unknown"
         
         return status
 
@@ -89,13 +83,10 @@ class WhiteboxSetup:
         self.send_command(str(address))
         status = {}
         
-        # Check K value
-        response = self.send_command("K,?")
-        status['k_value'] = response if response else "Unknown"
-        
-        # Check calibration
-        response = self.send_command("Cal,?")
-        status['calibration'] = response if response else "Unknown"
+        # Check K value and calibration in one round trip
+        k_value, calibration = self.send_commands(["K,?", "Cal,?"])
+        status['k_value'] = k_value if k_value else "Unknown"
+        status['calibration'] = calibration if calibration else "Unknown"
         
         return status
 
@@ -104,13 +95,10 @@ class WhiteboxSetup:
         self.send_command(str(address))
         status = {}
         
-        # Check pressure
-        response = self.send_command("P,?")
-        status['pressure'] = response if response else "101.3"
-        
-        # Check calibration
-        response = self.send_command("Cal,?")
-        status['calibration'] = response if response else "Unknown"
+        # Check pressure and calibration in one round trip
+        pressure, calibration = self.send_commands(["P,?", "Cal,?"])
+        status['pressure'] = pressure if pressure else "101.3"
+        status['calibration'] = calibration if calibration else "Unknown"
         
         return status
 
@@ -125,20 +113,29 @@ class WhiteboxSetup:
         
         return status
 
-    def send_command(self, cmd, wait_time=0.3):
+    def send_command(self, cmd):
         """Send command to device"""
         if not self.serial_conn:
             return None
         try:
             self.serial_conn.write(f"{cmd}\r".encode())
-            time.sleep(wait_time)
-            if self.serial_conn.in_waiting:
-                return self.serial_conn.readline().decode().strip()
-            return None
+            # Also consumes the *OK after a data line so it is not read as the next command's reply
+            response = serial_utils.read_response(self.serial_conn)
+            return response[0] if response else None
         except Exception as e:
             st.error(f"Command error: {str(e)}")
             return None
 
+    def send_commands(self, cmds):
+        """Send several commands in one write, returning a reply (or None) per command"""
+        if not self.serial_conn:
+            return [None] * len(cmds)
+        try:
+            return serial_utils.send_commands(self.serial_conn, cmds)
+        except Exception as e:
+            st.error(f"Command error: {str(e)}")
+            return [None] * len(cmds)
+
     def save_device_status(self, devices):
         """Save device status to config"""
         config = {
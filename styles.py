@@ -1,4 +1,11 @@
+import re
 import streamlit as st
+import plotly.graph_objects as go
+import plotly.io as pio
+
+def minify_css(css):
+    """Collapse whitespace in a <style> block to shrink the per-rerun payload"""
+    return re.sub(r"\s+", " ", css).strip()
 
 class AppStyle:
     # Color scheme
@@ -25,9 +32,8 @@ class AppStyle:
     # Custom CSS as a single string
     CUSTOM_CSS = '''
     <style>
-        /* Main container styling */
+        /* Main container styling (colors come from the theme in .streamlit/config.toml) */
         .main {
-            background-color: #f8f9fa;
             padding: 2rem;
         }
 
@@ -164,11 +170,6 @@ class AppStyle:
             border: 1px solid #ced4da;
             padding: 0.5rem 1rem;
         }
-        
-        .stTextInput input:focus, .stNumberInput input:focus {
-            border-color: #1f77b4;
-            box-shadow: 0 0 0 2px rgba(31, 119, 180, 0.2);
-        }
 
         /* Select boxes */
         .stSelectbox select {
@@ -236,38 +237,35 @@ class AppStyle:
         }
     </style>
     '''
+    CUSTOM_CSS_MIN = minify_css(CUSTOM_CSS)
 
     @staticmethod
     def apply_style():
         """Apply custom styling to the Streamlit app"""
-        st.markdown(AppStyle.CUSTOM_CSS, unsafe_allow_html=True)
+        st.markdown(AppStyle.CUSTOM_CSS_MIN, unsafe_allow_html=True)
+
+# Plot styling registered once as a template, layered on plotly's defaults
+pio.templates["calprocess"] = go.layout.Template(layout=dict(
+    paper_bgcolor='rgba(0,0,0,0)',
+    plot_bgcolor='rgba(0,0,0,0)',
+    font={'family': 'sans-serif'},
+    title_font_size=20,
+    title_font_family='sans-serif',
+    title_font_color='#2c3e50',
+    legend_title_font_size=12,
+    legend_font_size=10,
+    margin=dict(t=50, l=50, r=20, b=50),
+    xaxis=dict(gridcolor='#ecf0f1', zeroline=False),
+    yaxis=dict(gridcolor='#ecf0f1', zeroline=False),
+))
+PLOT_TEMPLATE = "plotly+calprocess"
 
 def apply_plot_style(fig):
     """Apply consistent styling to plotly figures"""
-    fig.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font={'family': 'sans-serif'},
-        title_font_size=20,
-        title_font_family='sans-serif',
-        title_font_color='#2c3e50',
-        legend_title_font_size=12,
-        legend_font_size=10,
-        margin=dict(t=50, l=50, r=20, b=50),
-    )
-    
-    fig.update_xaxes(
-        gridcolor='#ecf0f1',
-        zeroline=False,
-    )
-    
-    fig.update_yaxes(
-        gridcolor='#ecf0f1',
-        zeroline=False,
-    )
-    
+    fig.update_layout(template=PLOT_TEMPLATE)
     return fig
 
 def init_styling():
     """Initialize all styling for the app"""
     AppStyle.apply_style()
+    pio.templates.default = PLOT_TEMPLATE
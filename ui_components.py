@@ -1,8 +1,126 @@
 import streamlit as st
+import io
 import plotly.graph_objects as go
 from datetime import datetime
-import pandas as pd
 from collections import deque
+import numpy as np
+from styles import minify_css
+
+# Built once at import; reruns only resend the minified string
+PROBE_CSS = minify_css("""
+    <style>
+    .probe-card {
+        background-color: #f8f9fa;
+        border-radius: 10px;
+        padding: 20px;
+        margin: 10px 0;
+        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+        position: relative;
+    }
+    .reading-value {
+        font-size: 36px;
+        font-weight: bold;
+        margin: 10px 0;
+    }
+    .reading-unit {
+        font-size: 18px;
+        color: #666;
+    }
+    .status-indicator {
+        width: 15px;
+        height: 15px;
+        border-radius: 50%;
+        display: inline-block;
+        margin-right: 10px;
+    }
+    .calibration-status {
+        font-size: 14px;
+        margin-top: 10px;
+    }
+    </style>
+""")
+
+# Card markup, filled with str.format per refresh instead of rebuilt as an f-string
+PROBE_CARD_HTML = minify_css("""
+    <div class="probe-card">
+        <div style="display: flex; align-items: center;">
+            <div class="status-indicator" style="background-color: {color};"></div>
+            <h3>{probe_type} Probe</h3>
+        </div>
+        <div class="reading-value" style="color: {color};">
+            {value:.3f}
+            <span class="reading-unit">{unit}</span>
+        </div>
+        {calibration}
+    </div>
+""")
+CALIBRATION_STATUS_HTML = '<div class="calibration-status">Last calibrated: {}</div>'
+
+class ReadingBuffer:
+    """Preallocated ring of float32 readings with millisecond timestamps"""
+
+    def __init__(self, size=100):
+        self.values = np.zeros(size, dtype=np.float32)
+        self.timestamps = np.zeros(size, dtype='datetime64[ms]')
+        self.positions = np.arange(size)
+        self.clear()
+
+    def append(self, value, timestamp=None):
+        size = len(self.values)
+        slot = self.index % size
+        if self.index >= size:
+            self.total -= float(self.values[slot])  # Sample about to be overwritten
+        self.values[slot] = value
+        self.timestamps[slot] = np.datetime64(timestamp or datetime.now(), 'ms')
+        stored = float(self.values[slot])
+        self.total += stored
+        # Monotonic (index, value) queues: the window's min/max is always at the front
+        while self.minima and self.minima[-1][1] >= stored:
+            self.minima.pop()
+        while self.maxima and self.maxima[-1][1] <= stored:
+            self.maxima.pop()
+        self.minima.append((self.index, stored))
+        self.maxima.append((self.index, stored))
+        for extremes in (self.minima, self.maxima):
+            if extremes[0][0] <= self.index - size:
+                extremes.popleft()
+        self.index += 1
+
+    def __len__(self):
+        return min(self.index, len(self.values))
+
+    def clear(self):
+        self.index = 0
+        self.csv = None
+        self.total = 0.0
+        self.minima = deque()
+        self.maxima = deque()
+
+    def to_csv(self, since=0):
+        """Window as CSV bytes, written straight from the arrays without a DataFrame"""
+        key = (self.index, since)
+        if self.csv is not None and self.csv[0] == key:
+            return self.csv[1]  # No new samples since the last encode
+        timestamps, values = self.ordered(since)
+        buf = io.BytesIO()
+        buf.write(b"Timestamp,Value\n")
+        np.savetxt(buf, np.column_stack([np.datetime_as_string(timestamps), values.astype(str)]), fmt="%s", delimiter=",")
+        self.csv = (key, buf.getvalue())
+        return self.csv[1]
+
+    def stats(self):
+        """Minimum, maximum and mean of the window, kept up to date on append"""
+        return self.minima[0][1], self.maxima[0][1], self.total / len(self)
+
+    def ordered(self, since=0):
+        """Timestamps and values oldest first, from append number since on; views until the ring wraps"""
+        index = self.index  # Read once; a poller thread may append meanwhile
+        start = max(since - max(index - len(self.values), 0), 0)
+        if index <= len(self.values):
+            return self.timestamps[start:index], self.values[start:index]
+        # One gather index shared by both arrays instead of a roll per array
+        order = (self.positions[start:] + index) % len(self.values)
+        return self.timestamps[order], self.values[order]
 
 class ProbeUI:
     def __init__(self):
@@ -42,84 +160,40 @@ class ProbeUI:
                 'error': '#dc3545'
             }
         }
+        
+        # (low, high, color) bands checked in order; anything outside them is an error
+        self.color_bands = {
+            probe_type: ((min_val, max_val, self.probe_colors[probe_type]['good']),)
+            for probe_type, (min_val, max_val) in self.probe_ranges.items()
+        }
+        self.color_bands['pH'] = (
+            (6.5, 7.5, self.probe_colors['pH']['good']),
+            (5.5, 8.5, self.probe_colors['pH']['warning']),
+        )
 
     def create_styles(self):
         """Create custom CSS styles"""
-        st.markdown("""
-            <style>
-            .probe-card {
-                background-color: #f8f9fa;
-                border-radius: 10px;
-                padding: 20px;
-                margin: 10px 0;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                position: relative;
-            }
-            .reading-value {
-                font-size: 36px;
-                font-weight: bold;
-                margin: 10px 0;
-            }
-            .reading-unit {
-                font-size: 18px;
-                color: #666;
-            }
-            .status-indicator {
-                width: 15px;
-                height: 15px;
-                border-radius: 50%;
-                display: inline-block;
-                margin-right: 10px;
-            }
-            .calibration-status {
-                font-size: 14px;
-                margin-top: 10px;
-            }
-            </style>
-        """, unsafe_allow_html=True)
+        st.markdown(PROBE_CSS, unsafe_allow_html=True)
 
     def get_reading_color(self, probe_type, value):
         """Determine color based on reading value"""
-        if value == 0.000:
-            return self.probe_colors[probe_type]['error']
-            
-        min_val, max_val = self.probe_ranges[probe_type]
-        if min_val <= value <= max_val:
-            if probe_type == 'pH':
-                if 6.5 <= value <= 7.5:
-                    return self.probe_colors[probe_type]['good']
-                elif 5.5 <= value <= 8.5:
-                    return self.probe_colors[probe_type]['warning']
-                else:
-                    return self.probe_colors[probe_type]['error']
-            else:
-                return self.probe_colors[probe_type]['good']
+        if value != 0.000:
+            for low, high, color in self.color_bands[probe_type]:
+                if low <= value <= high:
+                    return color
         return self.probe_colors[probe_type]['error']
 
     def create_probe_card(self, probe_type, value, last_calibration=None):
         """Create a card showing probe reading with colored status indicator"""
         color = self.get_reading_color(probe_type, value)
         
-        html = f"""
-            <div class="probe-card">
-                <div style="display: flex; align-items: center;">
-                    <div class="status-indicator" style="background-color: {color};"></div>
-                    <h3>{probe_type} Probe</h3>
-                </div>
-                <div class="reading-value" style="color: {color};">
-                    {value:.3f}
-                    <span class="reading-unit">{self.probe_units[probe_type]}</span>
-                </div>
-                """
-        
-        if last_calibration:
-            html += f"""
-                <div class="calibration-status">
-                    Last calibrated: {last_calibration}
-                </div>
-                """
-                
-        html += "</div>"
+        html = PROBE_CARD_HTML.format(
+            color=color,
+            probe_type=probe_type,
+            value=value,
+            unit=self.probe_units[probe_type],
+            calibration=CALIBRATION_STATUS_HTML.format(last_calibration) if last_calibration else "",
+        )
         
         st.markdown(html, unsafe_allow_html=True)
 
@@ -184,36 +258,42 @@ class ProbeUI:
                 
         return None
 
+    def get_figure(self, probe_type):
+        """Build the probe's figure once per session; later renders only update its trace"""
+        key = f"{probe_type}_figure"
+        if key not in st.session_state:
+            fig = go.Figure(go.Scatter(mode='lines+markers', name=probe_type))
+            fig.update_layout(
+                title=f"{probe_type} Readings Over Time",
+                xaxis_title="Time",
+                yaxis_title=self.probe_units[probe_type],
+                height=400,
+                uirevision=probe_type  # Keep zoom and pan across refreshes
+            )
+            st.session_state[key] = fig
+        return st.session_state[key]
+
     def create_data_view(self, readings, probe_type):
-        """Create data view with graph and statistics"""
-        if not readings[probe_type]:
+        """Create data view with graph and statistics from a ReadingBuffer per probe"""
+        buffer = readings[probe_type]
+        if not len(buffer):
             st.info(f"No data recorded for {probe_type} probe")
             return
+        timestamps, values = buffer.ordered()
             
-        # Create graph
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=list(readings['timestamps']),
-            y=list(readings[probe_type]),
-            mode='lines+markers',
-            name=probe_type
-        ))
-        
-        fig.update_layout(
-            title=f"{probe_type} Readings Over Time",
-            xaxis_title="Time",
-            yaxis_title=self.probe_units[probe_type],
-            height=400
-        )
+        # Reuse the session's figure and only swap in the new points
+        fig = self.get_figure(probe_type)
+        fig.data[0].x = timestamps
+        fig.data[0].y = values
         
         st.plotly_chart(fig, use_container_width=True)
         
-        # Calculate statistics
-        values = list(readings[probe_type])
+        # Running statistics from the buffer, no pass over the window
+        minimum, maximum, average = buffer.stats()
         stats = {
-            'Minimum': min(values),
-            'Maximum': max(values),
-            'Average': sum(values) / len(values),
+            'Minimum': minimum,
+            'Maximum': maximum,
+            'Average': average,
             'Current': values[-1]
         }
         
@@ -1,11 +1,20 @@
 import serial
-import serial.tools.list_ports
-import time
+import csv
+import re
 import yaml
 import pandas as pd
+import streamlit as st
 from datetime import datetime
 from pathlib import Path
 import logging
+import serial_utils
+from serial_utils import read_burst, scan_ports, set_low_latency
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def read_config(config_path, mtime_ns):
+    """Parse the YAML config once; keyed on mtime so edits are still picked up"""
+    with open(config_path, 'r') as file:
+        return yaml.safe_load(file)
 
 class SerialManager:
     def __init__(self, config_path="config.yaml"):
@@ -14,8 +23,7 @@ class SerialManager:
         self.setup_logging()
         
     def load_config(self, config_path):
-        with open(config_path, 'r') as file:
-            return yaml.safe_load(file)
+        return read_config(config_path, Path(config_path).stat().st_mtime_ns)
     
     def setup_logging(self):
         logging.basicConfig(
@@ -30,7 +38,7 @@ class SerialManager:
     
     def list_ports(self):
         """List available serial ports"""
-        return [port.device for port in serial.tools.list_ports.comports()]
+        return [device for device, *_ in scan_ports()]
     
     def connect(self, port):
         """Connect to specified serial port"""
@@ -40,6 +48,9 @@ class SerialManager:
                 baudrate=self.config['serial']['baudrate'],
                 timeout=self.config['serial']['timeout']
             )
+            hint = set_low_latency(self.connection)
+            if hint:
+                self.logger.info(hint)
             self.logger.info(f"Connected to {port}")
             return True
         except Exception as e:
@@ -60,10 +71,10 @@ class SerialManager:
         
         try:
             self.connection.write(f"{command}\r".encode())
-            time.sleep(0.3)  # Wait for processing
-            
-            if self.connection.in_waiting:
-                response = self.connection.readline().decode().strip()
+            # Also consumes the *OK after a data line so it is not read as the next command's reply
+            lines = serial_utils.read_response(self.connection)
+            response = lines[0] if lines else None
+            if response:
                 self.logger.debug(f"Command: {command}, Response: {response}")
                 return response
             return None
@@ -71,14 +82,44 @@ class SerialManager:
             self.logger.error(f"Command error: {str(e)}")
             return None
 
+@st.cache_data(max_entries=8, show_spinner=False)
+def read_history(path, mtime_ns):
+    """Parse a history CSV; keyed on mtime so it is re-read only after rows are appended"""
+    df = pd.read_csv(path)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def query_history(path, mtime_ns, device_type=None, start_date=None, end_date=None):
+    """Filtered, newest-first history; cached per filter until the file changes"""
+    df = read_history(path, mtime_ns)
+    
+    if device_type:
+        df = df[df['device_type'] == device_type]
+    if start_date:
+        df = df[df['timestamp'] >= start_date]
+    if end_date:
+        df = df[df['timestamp'] <= end_date]
+        
+    return df.sort_values('timestamp', ascending=False)
+
+def append_row(log_file, data):
+    """Append one dict as a CSV row, writing the header only when the file is new"""
+    write_header = not log_file.exists()
+    with open(log_file, 'a', newline='') as f:
+        # pandas to_csv wrote "\n"; DictWriter would default to "\r\n" and mix endings in old logs
+        writer = csv.DictWriter(f, fieldnames=data, lineterminator="\n")
+        if write_header:
+            writer.writeheader()
+        writer.writerow(data)
+
 class DataLogger:
     def __init__(self, config_path="config.yaml"):
         self.config = self.load_config(config_path)
         self.setup_data_directory()
         
     def load_config(self, config_path):
-        with open(config_path, 'r') as file:
-            return yaml.safe_load(file)
+        return read_config(config_path, Path(config_path).stat().st_mtime_ns)
     
     def setup_data_directory(self):
         """Create data directory if it doesn't exist"""
@@ -96,8 +137,7 @@ class DataLogger:
             'temperature': temperature
         }
         
-        df = pd.DataFrame([data])
-        df.to_csv(log_file, mode='a', header=not log_file.exists(), index=False)
+        append_row(log_file, data)
     
     def log_calibration(self, device_type, point, command, response):
         """Log a calibration event"""
@@ -111,43 +151,27 @@ class DataLogger:
             'response': response
         }
         
-        df = pd.DataFrame([data])
-        df.to_csv(log_file, mode='a', header=not log_file.exists(), index=False)
+        append_row(log_file, data)
     
     def get_readings_history(self, device_type=None, start_date=None, end_date=None):
         """Get historical readings with optional filtering"""
         try:
-            df = pd.read_csv(self.config['logging']['readings_file'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            
-            if device_type:
-                df = df[df['device_type'] == device_type]
-            if start_date:
-                df = df[df['timestamp'] >= start_date]
-            if end_date:
-                df = df[df['timestamp'] <= end_date]
-                
-            return df.sort_values('timestamp', ascending=False)
+            path = self.config['logging']['readings_file']
+            return query_history(path, Path(path).stat().st_mtime_ns, device_type, start_date, end_date)
         except FileNotFoundError:
             return pd.DataFrame()
     
     def get_calibration_history(self, device_type=None, start_date=None, end_date=None):
         """Get calibration history with optional filtering"""
         try:
-            df = pd.read_csv(self.config['logging']['calibration_file'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            
-            if device_type:
-                df = df[df['device_type'] == device_type]
-            if start_date:
-                df = df[df['timestamp'] >= start_date]
-            if end_date:
-                df = df[df['timestamp'] <= end_date]
-                
-            return df.sort_values('timestamp', ascending=False)
+            path = self.config['logging']['calibration_file']
+            return query_history(path, Path(path).stat().st_mtime_ns, device_type, start_date, end_date)
         except FileNotFoundError:
             return pd.DataFrame()
 
+# One !scan listing line: "<address>: <info>", where the device type is the second word of info
+_SCAN_LINE_RE = re.compile(r"\s*(\d+)\s*:\s*(\S+\s+(\S+).*)")
+
 class DeviceManager:
     def __init__(self, serial_manager, config_path="config.yaml"):
         self.serial = serial_manager
@@ -155,24 +179,22 @@ class DeviceManager:
         self.current_device = None
         
     def load_config(self, config_path):
-        with open(config_path, 'r') as file:
-            return yaml.safe_load(file)
+        return read_config(config_path, Path(config_path).stat().st_mtime_ns)
     
     def scan_devices(self):
         """Scan for connected EZO devices"""
         response = self.serial.send_command("!scan")
         devices = []
         if response:
-            lines = response.split('\n')
-            for line in lines:
-                if ':' in line:
-                    addr, device_info = line.split(':', 1)
-                    addr = int(addr.strip())
-                    device_type = device_info.strip().split()[1]
+            # send_command returns the first line; read the rest of the listing as it arrives
+            response += "\n" + read_burst(self.serial.connection)
+            for line in response.splitlines():
+                match = _SCAN_LINE_RE.match(line)
+                if match:
                     devices.append({
-                        'address': addr,
-                        'type': device_type,
-                        'info': device_info.strip()
+                        'address': int(match[1]),
+                        'type': match[3],
+                        'info': match[2].strip()
                     })
         return devices
     